@@ -1,15 +1,24 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 from . import server
 
 # 配置日志记录
+# 日志先进入队列，由后台线程写入控制台和文件，避免阻塞事件循环
+log_queue = queue.Queue(-1)
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),  # 输出到控制台
-        logging.FileHandler('github_review.log')  # 输出到文件
-    ]
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
+log_listener = logging.handlers.QueueListener(
+    log_queue,
+    logging.StreamHandler(),  # 输出到控制台
+    logging.FileHandler('github_review.log')  # 输出到文件
+)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +29,7 @@ def main():
     try:
         asyncio.run(server.main())
     except Exception as e:
-        logger.error(f"Error running server: {e}", exc_info=True)
+        logger.error("Error running server: %s", e, exc_info=True)
         raise
 
 __all__ = ['main', 'server'] 
\ No newline at end of file
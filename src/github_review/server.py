@@ -1,8 +1,15 @@
+import io
 import os
+import re
 import logging
-from typing import Any, Optional
+from typing import Any
 import asyncio
-from github import Github
+import functools
+import time
+import itertools
+from collections import OrderedDict
+from dataclasses import dataclass
+import httpx
 from dotenv import load_dotenv
 from mcp.server import Server, NotificationOptions
 from mcp.server.models import InitializationOptions
@@ -17,174 +24,504 @@ load_dotenv()
 logger.info("Environment variables loaded")
 
 # Initialize GitHub client
-github_token = os.getenv("GITHUB_TOKEN")
-if not github_token:
+# GITHUB_TOKENS takes a comma-separated list of tokens that requests rotate
+# through, multiplying the rate limit; when it is unset or blank GITHUB_TOKEN
+# is used alone
+github_tokens = [
+    token.strip()
+    for token in (os.getenv("GITHUB_TOKENS") or os.getenv("GITHUB_TOKEN", "")).split(",")
+    if token.strip()
+]
+if not github_tokens:
     logger.error("GITHUB_TOKEN not found in environment variables")
     raise ValueError("GITHUB_TOKEN environment variable is required")
+_token_cycle = itertools.cycle(github_tokens)
 
-g = Github(github_token)
-logger.info("GitHub client initialized")
+# A single async connection pool is shared by every GitHub API request, so
+# concurrent fetches run on the event loop without any thread hops. It is
+# created on first use so that starting the server does no TLS setup
+GITHUB_API_URL = "https://api.github.com"
+_client: httpx.AsyncClient | None = None
+logger.info("GitHub client configured with %d token(s)", len(github_tokens))
+
+def get_client() -> httpx.AsyncClient:
+    """Get the shared GitHub API client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=GITHUB_API_URL,
+            headers={"Accept": "application/vnd.github+json"},
+            timeout=15.0,
+            # Retries here cover failed connects; gateway errors are retried in fetch()
+            transport=httpx.AsyncHTTPTransport(
+                retries=3,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            ),
+        )
+        logger.info("GitHub client initialized")
+    return _client
+
+def auth_headers() -> dict[str, str]:
+    """Get the Authorization header for the next token in the rotation"""
+    return {"Authorization": f"Bearer {next(_token_cycle)}"}
+
+# Seconds fetched pull request data is reused before hitting the API again
+PR_CACHE_TTL = 60
+_pr_cache: dict[tuple[str, str, int], tuple[float, Any]] = {}
+
+# PR files and discussion lists, keyed by (owner, repo, number) and tagged
+# with the PR's updated_at, kept for the CONTENT_CACHE_SIZE most recently used PRs
+CONTENT_CACHE_SIZE = 256
+_content_cache: OrderedDict[tuple[str, str, int], tuple[str, dict[str, list]]] = OrderedDict()
+
+# In-flight content loads, keyed by (owner, repo, number, include_discussion)
+_pending_content: dict[tuple[str, str, int, bool], asyncio.Future] = {}
+
+# Transient gateway errors from GitHub are retried with exponential backoff
+RETRY_STATUSES = {502, 503, 504}
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3
+
+# Last ETag and body seen per URL, kept for the ETAG_CACHE_SIZE most recently
+# used URLs. GitHub answers a matching If-None-Match with an empty 304 that
+# does not count against the rate limit
+ETAG_CACHE_SIZE = 2048
+_etag_cache: OrderedDict[str, tuple[str, Any]] = OrderedDict()
 
 # Create server instance
 server = Server("github-review")
 logger.info("MCP server instance created with prompts capability")
 
+# Tool and prompt listings never change, so build them once at import time
+TOOLS = [
+    types.Tool(
+        name="review-pr",
+        description="Review a GitHub pull request",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "pr_url": {
+                    "type": "string",
+                    "description": "GitHub PR URL (e.g. https://github.com/owner/repo/pull/123)",
+                }
+            },
+            "required": ["pr_url"]
+        }
+    )
+]
+
+PROMPTS = [
+    types.Prompt(
+        name="code-review",
+        description="Review code changes in a GitHub pull request",
+        arguments=[
+            types.PromptArgument(
+                name="pr_url",
+                description="GitHub PR URL",
+                required=True
+            ),
+            types.PromptArgument(
+                name="focus",
+                description="Review focus area (e.g. security, performance, tests)",
+                required=False
+            )
+        ]
+    ),
+    types.Prompt(
+        name="summarize-pr",
+        description="Get a concise summary of PR changes",
+        arguments=[
+            types.PromptArgument(
+                name="pr_url",
+                description="GitHub PR URL",
+                required=True
+            )
+        ]
+    )
+]
+
+# Prompt templates are filled in with str.format_map. Focus areas with their own
+# review and per-file concerns are listed in CODE_REVIEW_CONCERNS; any other
+# focus uses the general ones
+CODE_REVIEW_TEMPLATE = """Please review this pull request{focus_clause}:
+
+Title: {title}
+Author: {author}
+Description:
+{body}
+
+Changes: +{additions} -{deletions} in {changed_files} files
+
+Previous reviews and comments:
+{review_history}
+
+Please provide a thorough code review that includes:
+1. Code quality and style analysis
+2. Potential bugs or issues
+3. {review_concern}
+4. Test coverage assessment
+5. Documentation completeness
+6. Specific recommendations for improvement
+
+For each modified file, please analyze:
+- The purpose and impact of changes
+- Code structure and organization
+- Potential edge cases
+- {file_concern}
+
+Please be thorough but constructive in your feedback.
+"""
+
+CODE_REVIEW_CONCERNS = {
+    "security": ("Security implications and vulnerabilities", "Security risks and mitigations"),
+    "performance": ("Performance implications", "Performance bottlenecks"),
+}
+GENERAL_REVIEW_CONCERNS = ("General implementation concerns", "Areas for improvement")
+
+SUMMARIZE_PR_TEMPLATE = """Please provide a concise summary of this pull request:
+
+Title: {title}
+Author: {author}
+
+Key Information:
+- Changes: +{additions} -{deletions} in {changed_files} files
+- Status: {state}
+- Labels: {labels}
+
+Description:
+{body}
+
+Modified Files Overview:
+{file_summary}
+
+Please provide:
+1. A brief overview of the main changes
+2. The purpose and impact of these changes
+3. Current review status and any concerns raised
+4. Next steps or pending actions
+
+Keep the summary clear and focused on the most important aspects.
+"""
+
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     """List available tools"""
     logger.debug("Listing available tools")
-    return [
-        types.Tool(
-            name="review-pr",
-            description="Review a GitHub pull request",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "pr_url": {
-                        "type": "string",
-                        "description": "GitHub PR URL (e.g. https://github.com/owner/repo/pull/123)",
-                    }
-                },
-                "required": ["pr_url"]
-            }
-        )
-    ]
+    return TOOLS
 
 @server.list_prompts()
 async def handle_list_prompts() -> list[types.Prompt]:
     """List available prompt templates"""
     logger.debug("Listing available prompts")
-    return [
-        types.Prompt(
-            name="code-review",
-            description="Review code changes in a GitHub pull request",
-            arguments=[
-                types.PromptArgument(
-                    name="pr_url",
-                    description="GitHub PR URL",
-                    required=True
-                ),
-                types.PromptArgument(
-                    name="focus",
-                    description="Review focus area (e.g. security, performance, tests)",
-                    required=False
-                )
-            ]
-        ),
-        types.Prompt(
-            name="summarize-pr",
-            description="Get a concise summary of PR changes",
-            arguments=[
-                types.PromptArgument(
-                    name="pr_url",
-                    description="GitHub PR URL",
-                    required=True
-                )
-            ]
-        )
-    ]
+    return PROMPTS
 
+# Matches https://github.com/<owner>/<repo>/pull/<number>, optionally with a trailing slash
+PR_URL_PATTERN = re.compile(r"^https?://github\.com/(?P<owner>[^/]+)/(?P<repo>[^/]+)/pull/(?P<number>\d+)/?$")
+
+@functools.lru_cache(maxsize=1024)
 def parse_pr_url(pr_url: str) -> tuple[str, str, int]:
     """Parse PR URL to get owner, repo, and PR number"""
-    logger.debug(f"Parsing PR URL: {pr_url}")
-    try:
-        parts = pr_url.split('/')
-        owner = parts[-4]
-        repo = parts[-3]
-        pr_number = int(parts[-1])
-        logger.debug(f"Parsed PR URL - owner: {owner}, repo: {repo}, PR number: {pr_number}")
-        return owner, repo, pr_number
-    except (IndexError, ValueError) as e:
-        logger.error(f"Failed to parse PR URL: {pr_url}", exc_info=True)
-        raise ValueError(f"Invalid PR URL format: {e}")
-
-def get_pr_content(pr_url: str) -> dict[str, Any]:
-    """Get PR content, including comments and review information"""
-    logger.info(f"Fetching PR content for URL: {pr_url}")
-    try:
-        owner, repo, pr_number = parse_pr_url(pr_url)
-        repo = g.get_repo(f"{owner}/{repo}")
-        logger.debug(f"Accessing repository: {owner}/{repo}")
-        
-        pr = repo.get_pull(pr_number)
-        logger.debug(f"Retrieved PR #{pr_number}")
-        
-        # Get PR comments
-        logger.debug("Fetching PR comments...")
-        comments = []
-        for comment in pr.get_issue_comments():
-            comments.append({
-                'user': comment.user.login,
-                'body': comment.body,
-                'created_at': comment.created_at.isoformat(),
-                'updated_at': comment.updated_at.isoformat()
-            })
-            logger.debug(f"Processed comment by {comment.user.login}")
-        
-        # Get PR review comments
-        logger.debug("Fetching PR review comments...")
-        review_comments = []
-        for comment in pr.get_review_comments():
-            review_comments.append({
-                'user': comment.user.login,
-                'body': comment.body,
-                'path': comment.path,
-                'position': comment.position,
-                'created_at': comment.created_at.isoformat(),
-                'updated_at': comment.updated_at.isoformat()
-            })
-            logger.debug(f"Processed review comment by {comment.user.login} on {comment.path}")
+    logger.debug("Parsing PR URL: %s", pr_url)
+    match = PR_URL_PATTERN.match(pr_url.strip())
+    if not match:
+        logger.error("Failed to parse PR URL: %s", pr_url)
+        raise ValueError(f"Invalid PR URL format: {pr_url}")
+    
+    owner, repo, pr_number = match["owner"], match["repo"], int(match["number"])
+    logger.debug("Parsed PR URL - owner: %s, repo: %s, PR number: %d", owner, repo, pr_number)
+    return owner, repo, pr_number
+
+async def fetch(
+    url: str,
+    params: dict[str, Any] | None = None,
+    revalidate: bool = True
+) -> tuple[Any, dict[str, str] | None]:
+    """Get a GitHub API URL as raw JSON plus its pagination links, revalidating with ETags
+    
+    An ETag only covers the body, so links always come from the current response.
+    They are None when a 304 carried no Link header and the links are unknown.
+    """
+    client = get_client()
+    request = client.build_request("GET", url, params=params, headers=auth_headers())
+    key = str(request.url)
+    cached = _etag_cache.get(key) if revalidate else None
+    if cached:
+        request.headers["If-None-Match"] = cached[0]
+    
+    logger.debug("GET %s", key)
+    for attempt in range(MAX_RETRIES + 1):
+        resp = await client.send(request)
+        if resp.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            break
+        delay = RETRY_BACKOFF * 2 ** attempt
+        logger.warning("GET %s returned %d, retrying in %.1fs", key, resp.status_code, delay)
+        await asyncio.sleep(delay)
+    
+    links = {rel: link["url"] for rel, link in resp.links.items()}
+    if resp.status_code == 304 and cached:
+        logger.debug("Not modified: %s", key)
+        _etag_cache.move_to_end(key)
+        return cached[1], links or None
+    
+    resp.raise_for_status()
+    data = resp.json()
+    etag = resp.headers.get("ETag")
+    if etag:
+        _etag_cache[key] = (etag, data)
+        _etag_cache.move_to_end(key)
+        if len(_etag_cache) > ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+    return data, links
+
+async def fetch_page(url: str, params: dict[str, Any] | None = None) -> tuple[Any, dict[str, str]]:
+    """Get one page of a GitHub list endpoint together with its current pagination links"""
+    data, links = await fetch(url, params)
+    if links is None:
+        # A short page is the last one, so it has no later pages to point to
+        per_page = int(httpx.URL(url, params=params).params.get("per_page", 30))
+        if len(data) < per_page:
+            return data, {}
+        # The list may have grown past this unchanged page, so ask again
+        # without If-None-Match to learn where the later pages are
+        data, links = await fetch(url, params, revalidate=False)
+    return data, links
+
+async def get_json(path: str) -> Any:
+    """Get a GitHub API endpoint as raw JSON"""
+    data, _ = await fetch(path)
+    return data
+
+async def get_paginated(path: str) -> list[dict[str, Any]]:
+    """Get all pages of a GitHub list endpoint as raw JSON"""
+    data, links = await fetch_page(path, params={"per_page": 100})
+    items = list(data)
+    
+    # Page-numbered endpoints advertise their last page, so all remaining
+    # pages can be requested at once instead of walking the next links. The
+    # links come from the live first page, so pages added since are included
+    last_url = httpx.URL(links["last"]) if "last" in links else None
+    if last_url and "page" in last_url.params:
+        last_page = int(last_url.params["page"])
+        pages = await asyncio.gather(*(
+            fetch(str(last_url.copy_set_param("page", page)))
+            for page in range(2, last_page + 1)
+        ))
+        for data, _ in pages:
+            items.extend(data)
+        return items
+    
+    # The next link already carries the query string
+    url = links.get("next")
+    while url:
+        data, links = await fetch_page(url)
+        items.extend(data)
+        url = links.get("next")
+    return items
+
+async def get_pull_cached(owner: str, repo: str, pr_number: int) -> dict[str, Any]:
+    """Get pull request data, reusing it for PR_CACHE_TTL seconds"""
+    key = (owner, repo, pr_number)
+    cached = _pr_cache.get(key)
+    if cached and time.monotonic() - cached[0] < PR_CACHE_TTL:
+        logger.debug("Using cached PR #%d", pr_number)
+        return cached[1]
+    
+    pr = await get_json(f"/repos/{owner}/{repo}/pulls/{pr_number}")
+    now = time.monotonic()
+    # Re-inserting keeps entries in fetch order, so expired ones sit at the front
+    _pr_cache.pop(key, None)
+    _pr_cache[key] = (now, pr)
+    for stale_key, (fetched_at, _) in list(_pr_cache.items()):
+        if now - fetched_at < PR_CACHE_TTL:
+            break
+        del _pr_cache[stale_key]
+    return pr
+
+def start_fetch(coro) -> asyncio.Future:
+    """Start a fetch as a task that runs eagerly up to its first real await (Python 3.12+)"""
+    if hasattr(asyncio, "eager_task_factory"):
+        return asyncio.eager_task_factory(asyncio.get_running_loop(), coro)
+    return asyncio.ensure_future(coro)
+
+@dataclass(slots=True)
+class Comment:
+    """A general PR conversation comment"""
+    user: str
+    body: str
+    created_at: str
+    updated_at: str
+
+@dataclass(slots=True)
+class ReviewComment:
+    """A review comment attached to a line of a file"""
+    user: str
+    body: str
+    path: str
+    position: int | None
+    created_at: str
+    updated_at: str
+
+@dataclass(slots=True)
+class Review:
+    """A submitted or pending PR review"""
+    user: str
+    state: str
+    body: str
+    submitted_at: str | None
+
+@dataclass(slots=True)
+class FileChange:
+    """A file changed by a PR"""
+    filename: str
+    status: str
+    changes: int
+    patch: str | None
+
+async def get_pr_files(owner: str, repo: str, pr_number: int) -> list[FileChange]:
+    """Get the files changed by a PR"""
+    raw_files = await get_paginated(f"/repos/{owner}/{repo}/pulls/{pr_number}/files")
+    
+    files = [
+        FileChange(
+            filename=file['filename'],
+            status=file['status'],
+            changes=file['changes'],
+            # Binary and very large diffs come back without a patch
+            patch=file.get('patch')
+        )
+        for file in raw_files
+    ]
+    
+    logger.debug("Retrieved %d files", len(files))
+    return files
+
+async def get_pr_discussion(owner: str, repo: str, pr_number: int) -> dict[str, list[Any]]:
+    """Get a PR's comments, review comments and reviews"""
+    # The three paginated lists are independent, so fetch them concurrently
+    raw_comments, raw_review_comments, raw_reviews = await asyncio.gather(
+        start_fetch(get_paginated(f"/repos/{owner}/{repo}/issues/{pr_number}/comments")),
+        start_fetch(get_paginated(f"/repos/{owner}/{repo}/pulls/{pr_number}/comments")),
+        start_fetch(get_paginated(f"/repos/{owner}/{repo}/pulls/{pr_number}/reviews")),
+    )
+    
+    # Get PR comments
+    comments = [
+        Comment(
+            user=comment['user']['login'],
+            body=comment['body'],
+            created_at=comment['created_at'],
+            updated_at=comment['updated_at']
+        )
+        for comment in raw_comments
+    ]
+    
+    # Get PR review comments
+    review_comments = [
+        ReviewComment(
+            user=comment['user']['login'],
+            body=comment['body'],
+            path=comment['path'],
+            position=comment['position'],
+            created_at=comment['created_at'],
+            updated_at=comment['updated_at']
+        )
+        for comment in raw_review_comments
+    ]
+    
+    # Get PR reviews
+    reviews = [
+        Review(
+            user=review['user']['login'],
+            state=review['state'],
+            body=review['body'],
+            submitted_at=review.get('submitted_at')
+        )
+        for review in raw_reviews
+    ]
+    
+    logger.debug("Retrieved %d comments, %d review comments and %d reviews",
+                 len(comments), len(review_comments), len(reviews))
+    return {
+        'comments': comments,
+        'review_comments': review_comments,
+        'reviews': reviews
+    }
+
+async def load_pr_content(owner: str, repo: str, pr_number: int, include_discussion: bool) -> dict[str, Any]:
+    """Load PR content from the content cache or GitHub"""
+    pr = await get_pull_cached(owner, repo, pr_number)
+    logger.debug("Retrieved PR #%d", pr_number)
+    
+    # Any new commit, comment or review bumps updated_at, so files and
+    # discussion fetched for the same updated_at are still current
+    key = (owner, repo, pr_number)
+    cached = _content_cache.get(key)
+    if (cached and cached[0] == pr['updated_at']
+            and (not include_discussion or 'reviews' in cached[1])):
+        _content_cache.move_to_end(key)
+        logger.debug("Using cached files and discussion for PR #%d", pr_number)
+        lists = cached[1]
+    else:
+        if include_discussion:
+            logger.debug("Fetching PR files, comments, review comments and reviews...")
+            files, discussion = await asyncio.gather(
+                start_fetch(get_pr_files(owner, repo, pr_number)),
+                start_fetch(get_pr_discussion(owner, repo, pr_number)),
+            )
+        else:
+            logger.debug("Fetching PR files...")
+            files, discussion = await get_pr_files(owner, repo, pr_number), {}
         
-        # Get PR reviews
-        logger.debug("Fetching PR reviews...")
-        reviews = []
-        for review in pr.get_reviews():
-            reviews.append({
-                'user': review.user.login,
-                'state': review.state,
-                'body': review.body,
-                'submitted_at': review.submitted_at.isoformat() if review.submitted_at else None
-            })
-            logger.debug(f"Processed review by {review.user.login}: {review.state}")
+        logger.info("Successfully retrieved PR content with %d files%s",
+                   len(files), " and discussion" if discussion else "")
         
-        # Get file changes
-        files = []
-        logger.debug("Fetching PR files...")
-        for file in pr.get_files():
-            files.append({
-                'filename': file.filename,
-                'status': file.status,
-                'changes': file.changes,
-                'patch': file.patch
-            })
-            logger.debug(f"Processed file: {file.filename}")
+        lists = {'files': files, **discussion}
+        _content_cache[key] = (pr['updated_at'], lists)
+        _content_cache.move_to_end(key)
+        if len(_content_cache) > CONTENT_CACHE_SIZE:
+            _content_cache.popitem(last=False)
+    
+    # GitHub settles mergeability after the fact and changes it without
+    # bumping updated_at, so the PR's own fields always come from the live PR
+    return {
+        'title': pr['title'],
+        'body': pr['body'],
+        'state': pr['state'],
+        'mergeable': pr['mergeable'],
+        'mergeable_state': pr['mergeable_state'],
+        'additions': pr['additions'],
+        'deletions': pr['deletions'],
+        'changed_files': pr['changed_files'],
+        'labels': [label['name'] for label in pr['labels']],
+        'created_at': pr['created_at'],
+        'updated_at': pr['updated_at'],
+        'author': pr['user']['login'],
+        **lists
+    }
+
+async def get_pr_content(pr_url: str, include_discussion: bool = True) -> dict[str, Any]:
+    """Get PR content, including comments and review information unless include_discussion is False"""
+    logger.info("Fetching PR content for URL: %s", pr_url)
+    try:
+        owner, repo, pr_number = parse_pr_url(pr_url)
+        logger.debug("Accessing repository: %s/%s", owner, repo)
         
-        content = {
-            'title': pr.title,
-            'body': pr.body,
-            'state': pr.state,
-            'mergeable': pr.mergeable,
-            'mergeable_state': pr.mergeable_state,
-            'files': files,
-            'additions': pr.additions,
-            'deletions': pr.deletions,
-            'changed_files': pr.changed_files,
-            'comments': comments,
-            'review_comments': review_comments,
-            'reviews': reviews,
-            'labels': [label.name for label in pr.labels],
-            'created_at': pr.created_at.isoformat(),
-            'updated_at': pr.updated_at.isoformat(),
-            'author': pr.user.login
-        }
+        # Calls for the same PR that overlap, e.g. review-pr and a prompt issued
+        # together, share one in-flight load. A full load also serves summaries
+        key = (owner, repo, pr_number, include_discussion)
+        task = _pending_content.get((owner, repo, pr_number, True)) or _pending_content.get(key)
+        if task is None:
+            task = start_fetch(load_pr_content(owner, repo, pr_number, include_discussion))
+            _pending_content[key] = task
+            task.add_done_callback(lambda _: _pending_content.pop(key, None))
+        else:
+            logger.debug("Joining in-flight load for PR #%d", pr_number)
         
-        logger.info(f"Successfully retrieved PR content with {len(files)} files, "
-                   f"{len(comments)} comments, {len(review_comments)} review comments, "
-                   f"and {len(reviews)} reviews")
-        return content
+        # Shield the shared load so one caller being cancelled does not cancel it for the rest
+        return await asyncio.shield(task)
         
     except Exception as e:
-        logger.error(f"Error fetching PR content: {e}", exc_info=True)
+        logger.error("Error fetching PR content: %s", e, exc_info=True)
         raise
 
 @server.call_tool()
@@ -193,8 +530,8 @@ async def handle_call_tool(
     arguments: dict | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
     """Handle tool call"""
-    logger.info(f"Tool call received: {name}")
-    logger.debug(f"Tool arguments: {arguments}")
+    logger.info("Tool call received: %s", name)
+    logger.debug("Tool arguments: %s", arguments)
     
     if not arguments:
         logger.error("Missing arguments in tool call")
@@ -207,65 +544,24 @@ async def handle_call_tool(
             raise ValueError("Missing PR URL")
             
         try:
-            pr_content = get_pr_content(pr_url)
+            pr_content = await get_pr_content(pr_url)
             logger.debug("Formatting PR content for output")
-            
-            # Format output
-            output = [
-                f"PR Title: {pr_content['title']}\n",
-                f"Author: {pr_content['author']}",
-                f"State: {pr_content['state']}",
-                f"Created: {pr_content['created_at']}",
-                f"Updated: {pr_content['updated_at']}\n",
-                f"Description: {pr_content['body']}\n",
-                f"Changes: +{pr_content['additions']} -{pr_content['deletions']} in {pr_content['changed_files']} files",
-                f"Labels: {', '.join(pr_content['labels'])}\n",
-                f"Mergeable: {pr_content['mergeable']} ({pr_content['mergeable_state']})\n",
-                "\nReviews:\n"
-            ]
-            
-            # Add reviews information
-            for review in pr_content['reviews']:
-                output.append(f"- {review['user']} ({review['state']})")
-                if review['body']:
-                    output.append(f"  Comment: {review['body']}")
-            
-            output.append("\nComments:\n")
-            # Add general comments
-            for comment in pr_content['comments']:
-                output.append(f"- {comment['user']} at {comment['created_at']}:")
-                output.append(f"  {comment['body']}")
-            
-            output.append("\nReview Comments:\n")
-            # Add line comments
-            for comment in pr_content['review_comments']:
-                output.append(f"- {comment['user']} on {comment['path']} at position {comment['position']}:")
-                output.append(f"  {comment['body']}")
-            
-            output.append("\nModified files:\n")
-            # Add file change information
-            for file in pr_content['files']:
-                output.append(f"\nFile: {file['filename']}")
-                output.append(f"Status: {file['status']}")
-                output.append(f"Changes: {file['changes']} lines")
-                if file['patch']:
-                    output.append("Diff:")
-                    output.append(file['patch'])
+            output = render_pr_review(pr_content)
             
             logger.info("Successfully generated PR review output")
             return [types.TextContent(
                 type="text",
-                text="\n".join(output)
+                text=output
             )]
             
         except Exception as e:
-            logger.error(f"Error in review-pr tool: {e}", exc_info=True)
+            logger.error("Error in review-pr tool: %s", e, exc_info=True)
             return [types.TextContent(
                 type="text", 
                 text=f"Error retrieving PR content: {str(e)}"
             )]
             
-    logger.error(f"Unknown tool called: {name}")
+    logger.error("Unknown tool called: %s", name)
     raise ValueError(f"Unknown tool: {name}")
 
 @server.get_prompt()
@@ -274,48 +570,33 @@ async def handle_get_prompt(
     arguments: dict[str, str] | None
 ) -> types.GetPromptResult:
     """Handle prompt request"""
-    logger.info(f"Prompt request received: {name}")
-    logger.debug(f"Prompt arguments: {arguments}")
+    logger.info("Prompt request received: %s", name)
+    logger.debug("Prompt arguments: %s", arguments)
     
     if not arguments or "pr_url" not in arguments:
         logger.error("Missing PR URL in prompt arguments")
         raise ValueError("Missing PR URL argument")
         
     try:
-        pr_content = get_pr_content(arguments["pr_url"])
+        # summarize-pr never shows comments or reviews, so skip fetching them
+        pr_content = await get_pr_content(
+            arguments["pr_url"],
+            include_discussion=name != "summarize-pr"
+        )
         
         if name == "code-review":
             focus = arguments.get("focus", "general")
-            prompt_text = f"""Please review this pull request{f' focusing on {focus}' if focus != 'general' else ''}:
-
-Title: {pr_content['title']}
-Author: {pr_content['author']}
-Description:
-{pr_content['body']}
-
-Changes: +{pr_content['additions']} -{pr_content['deletions']} in {pr_content['changed_files']} files
-
-Previous reviews and comments:
-{format_review_history(pr_content)}
-
-Please provide a thorough code review that includes:
-1. Code quality and style analysis
-2. Potential bugs or issues
-3. {'Security implications and vulnerabilities' if focus == 'security' else 'Performance implications' if focus == 'performance' else 'General implementation concerns'}
-4. Test coverage assessment
-5. Documentation completeness
-6. Specific recommendations for improvement
-
-For each modified file, please analyze:
-- The purpose and impact of changes
-- Code structure and organization
-- Potential edge cases
-- {'Security risks and mitigations' if focus == 'security' else 'Performance bottlenecks' if focus == 'performance' else 'Areas for improvement'}
-
-Please be thorough but constructive in your feedback.
-"""
+            focus_clause = f" focusing on {focus}" if focus != "general" else ""
+            review_concern, file_concern = CODE_REVIEW_CONCERNS.get(focus, GENERAL_REVIEW_CONCERNS)
+            prompt_text = CODE_REVIEW_TEMPLATE.format_map({
+                **pr_content,
+                'focus_clause': focus_clause,
+                'review_history': format_review_history(pr_content),
+                'review_concern': review_concern,
+                'file_concern': file_concern
+            })
             return types.GetPromptResult(
-                description=f"Code review for PR{f' focusing on {focus}' if focus != 'general' else ''}",
+                description=f"Code review for PR{focus_clause}",
                 messages=[
                     types.PromptMessage(
                         role="user",
@@ -328,30 +609,11 @@ Please be thorough but constructive in your feedback.
             )
             
         elif name == "summarize-pr":
-            prompt_text = f"""Please provide a concise summary of this pull request:
-
-Title: {pr_content['title']}
-Author: {pr_content['author']}
-
-Key Information:
-- Changes: +{pr_content['additions']} -{pr_content['deletions']} in {pr_content['changed_files']} files
-- Status: {pr_content['state']}
-- Labels: {', '.join(pr_content['labels'])}
-
-Description:
-{pr_content['body']}
-
-Modified Files Overview:
-{format_file_summary(pr_content['files'])}
-
-Please provide:
-1. A brief overview of the main changes
-2. The purpose and impact of these changes
-3. Current review status and any concerns raised
-4. Next steps or pending actions
-
-Keep the summary clear and focused on the most important aspects.
-"""
+            prompt_text = SUMMARIZE_PR_TEMPLATE.format_map({
+                **pr_content,
+                'labels': ', '.join(pr_content['labels']),
+                'file_summary': format_file_summary(pr_content['files'])
+            })
             return types.GetPromptResult(
                 description="PR summary",
                 messages=[
@@ -365,13 +627,67 @@ Keep the summary clear and focused on the most important aspects.
                 ]
             )
             
-        logger.error(f"Unknown prompt requested: {name}")
+        logger.error("Unknown prompt requested: %s", name)
         raise ValueError(f"Unknown prompt: {name}")
         
     except Exception as e:
-        logger.error(f"Error generating prompt: {e}", exc_info=True)
+        logger.error("Error generating prompt: %s", e, exc_info=True)
         raise ValueError(f"Error generating prompt: {str(e)}")
 
+def render_pr_review(pr_content: dict) -> str:
+    """Render the review-pr tool output"""
+    (title, author, state, created_at, updated_at, body, additions, deletions,
+     changed_files, labels, mergeable, mergeable_state, reviews, comments,
+     review_comments, files) = (pr_content[key] for key in (
+        'title', 'author', 'state', 'created_at', 'updated_at', 'body', 'additions', 'deletions',
+        'changed_files', 'labels', 'mergeable', 'mergeable_state', 'reviews', 'comments',
+        'review_comments', 'files'))
+    
+    # Written piece by piece so large patches go straight into the buffer
+    # instead of being collected in a list and joined
+    out = io.StringIO()
+    write = out.write
+    write(f"PR Title: {title}\n")
+    write(f"\nAuthor: {author}")
+    write(f"\nState: {state}")
+    write(f"\nCreated: {created_at}")
+    write(f"\nUpdated: {updated_at}\n")
+    write(f"\nDescription: {body}\n")
+    write(f"\nChanges: +{additions} -{deletions} in {changed_files} files")
+    write(f"\nLabels: {', '.join(labels)}\n")
+    write(f"\nMergeable: {mergeable} ({mergeable_state})\n")
+    
+    write("\n\nReviews:\n")
+    # Add reviews information
+    for review in reviews:
+        write(f"\n- {review.user} ({review.state})")
+        if review.body:
+            write(f"\n  Comment: {review.body}")
+    
+    write("\n\nComments:\n")
+    # Add general comments
+    for comment in comments:
+        write(f"\n- {comment.user} at {comment.created_at}:")
+        write(f"\n  {comment.body}")
+    
+    write("\n\nReview Comments:\n")
+    # Add line comments
+    for comment in review_comments:
+        write(f"\n- {comment.user} on {comment.path} at position {comment.position}:")
+        write(f"\n  {comment.body}")
+    
+    write("\n\nModified files:\n")
+    # Add file change information
+    for file in files:
+        write(f"\n\nFile: {file.filename}")
+        write(f"\nStatus: {file.status}")
+        write(f"\nChanges: {file.changes} lines")
+        if file.patch:
+            write("\nDiff:\n")
+            write(file.patch)
+    
+    return out.getvalue()
+
 def format_review_history(pr_content: dict) -> str:
     """Format review history"""
     history = []
@@ -379,32 +695,44 @@ def format_review_history(pr_content: dict) -> str:
     # Add reviews
     if pr_content['reviews']:
         history.append("Reviews:")
-        for review in pr_content['reviews']:
-            history.append(f"- {review['user']} ({review['state']})")
-            if review['body']:
-                history.append(f"  Comment: {review['body']}")
+        history.extend([
+            line
+            for review in pr_content['reviews']
+            for line in (
+                f"- {review.user} ({review.state})",
+                f"  Comment: {review.body}" if review.body else None
+            )
+            if line is not None
+        ])
     
     # Add comments
     if pr_content['comments']:
         history.append("\nGeneral Comments:")
-        for comment in pr_content['comments']:
-            history.append(f"- {comment['user']}: {comment['body']}")
+        history.extend([
+            f"- {comment.user}: {comment.body}"
+            for comment in pr_content['comments']
+        ])
     
     # Add review comments
     if pr_content['review_comments']:
         history.append("\nCode Comments:")
-        for comment in pr_content['review_comments']:
-            history.append(f"- {comment['user']} on {comment['path']}: {comment['body']}")
+        history.extend([
+            f"- {comment.user} on {comment.path}: {comment.body}"
+            for comment in pr_content['review_comments']
+        ])
     
     return "\n".join(history)
 
-def format_file_summary(files: list) -> str:
+def format_file_summary(files: list[FileChange]) -> str:
     """Format file change summary"""
-    summary = []
-    for file in files:
-        summary.append(f"- {file['filename']}")
-        summary.append(f"  Changes: {file['changes']} lines ({file['status']})")
-    return "\n".join(summary)
+    return "\n".join([
+        line
+        for file in files
+        for line in (
+            f"- {file.filename}",
+            f"  Changes: {file.changes} lines ({file.status})"
+        )
+    ])
 
 async def main():
     """Run the server"""
@@ -425,9 +753,11 @@ async def main():
                 )
             )
     except Exception as e:
-        logger.error(f"Server error: {e}", exc_info=True)
+        logger.error("Server error: %s", e, exc_info=True)
         raise
     finally:
+        if _client is not None:
+            await _client.aclose()
         logger.info("Server shutdown")
 
 if __name__ == "__main__":
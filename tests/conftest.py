@@ -0,0 +1,4 @@
+import os
+
+# server.py refuses to import without a token; the tests never reach GitHub
+os.environ.setdefault("GITHUB_TOKEN", "test-token")
@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from github_review import server
+
+
+class FakeGitHub:
+    """Serves a PR whose issue comment list can grow, with body-hashed ETags"""
+
+    def __init__(self, comment_count: int):
+        self.comment_count = comment_count
+        self.updated_at = "2024-01-01T00:00:00Z"
+        self.mergeable = True
+        self.mergeable_state = "clean"
+
+    def add_comments(self, count: int):
+        self.comment_count += count
+        self.updated_at = f"2024-01-01T00:00:{self.comment_count % 60:02d}Z"
+
+    def pull(self) -> dict:
+        return {
+            "title": "Fix", "body": "", "state": "open", "mergeable": self.mergeable,
+            "mergeable_state": self.mergeable_state, "additions": 1, "deletions": 0,
+            "changed_files": 1, "labels": [], "created_at": "2024-01-01T00:00:00Z",
+            "updated_at": self.updated_at, "user": {"login": "author"},
+        }
+
+    def comments_page(self, url: httpx.URL) -> tuple[list, dict[str, str]]:
+        per_page = int(url.params.get("per_page", 30))
+        page = int(url.params.get("page", 1))
+        last_page = max(1, -(-self.comment_count // per_page))
+        start = (page - 1) * per_page
+        body = [
+            {"user": {"login": "commenter"}, "body": f"comment {i}",
+             "created_at": "2024-01-01T00:00:00Z", "updated_at": "2024-01-01T00:00:00Z"}
+            for i in range(start, min(start + per_page, self.comment_count))
+        ]
+        links = {}
+        if page < last_page:
+            links["next"] = url.copy_set_param("page", page + 1)
+            links["last"] = url.copy_set_param("page", last_page)
+        return body, links
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        links = {}
+        if path == "/repos/owner/repo/pulls/1":
+            body = self.pull()
+        elif path == "/repos/owner/repo/issues/1/comments":
+            body, links = self.comments_page(request.url)
+        else:
+            body = []
+
+        content = json.dumps(body).encode()
+        etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+        # Like GitHub, a 304 is not guaranteed to repeat the Link header
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+
+        headers = {"ETag": etag, "Content-Type": "application/json"}
+        if links:
+            headers["Link"] = ", ".join(f'<{url}>; rel="{rel}"' for rel, url in links.items())
+        return httpx.Response(200, content=content, headers=headers)
+
+
+@pytest.fixture
+def github():
+    fake = FakeGitHub(comment_count=0)
+    server._client = httpx.AsyncClient(
+        base_url=server.GITHUB_API_URL,
+        transport=httpx.MockTransport(fake.handle),
+    )
+    yield fake
+    server._client = None
+    server._etag_cache.clear()
+    server._pr_cache.clear()
+    server._content_cache.clear()
+
+
+def review_comment_count() -> int:
+    # Skip the PR TTL cache so each call sees the fake's current updated_at
+    server._pr_cache.clear()
+    content = asyncio.run(server.get_pr_content("https://github.com/owner/repo/pull/1"))
+    return len(content["comments"])
+
+
+def test_list_growing_past_an_unchanged_full_page(github):
+    github.comment_count = 100
+    assert review_comment_count() == 100
+
+    github.add_comments(1)
+    assert review_comment_count() == 101
+
+
+def test_list_growing_past_the_advertised_last_page(github):
+    github.comment_count = 250
+    assert review_comment_count() == 250
+
+    github.add_comments(51)
+    assert review_comment_count() == 301
+
+
+def test_unchanged_short_list_is_only_revalidated(github):
+    github.comment_count = 5
+    assert review_comment_count() == 5
+
+    requests = []
+    handle = github.handle
+    server._client._transport = httpx.MockTransport(
+        lambda request: requests.append(request) or handle(request)
+    )
+    server._content_cache.clear()
+    assert review_comment_count() == 5
+    comment_requests = [r for r in requests if r.url.path.endswith("/issues/1/comments")]
+    assert len(comment_requests) == 1
+    assert "If-None-Match" in comment_requests[0].headers
+
+
+def test_etag_cache_is_bounded(github, monkeypatch):
+    monkeypatch.setattr(server, "ETAG_CACHE_SIZE", 3)
+    github.comment_count = 250
+    assert review_comment_count() == 250
+    assert len(server._etag_cache) == 3
+
+
+def test_expired_pull_requests_are_dropped(github, monkeypatch):
+    server._pr_cache[("owner", "other", 7)] = (0.0, {})
+    # Replace only the module's reference so the event loop keeps the real clock
+    clock = SimpleNamespace(monotonic=lambda: server.PR_CACHE_TTL + 1.0)
+    monkeypatch.setattr(server, "time", clock)
+    asyncio.run(server.get_pull_cached("owner", "repo", 1))
+    assert list(server._pr_cache) == [("owner", "repo", 1)]
+
+
+def test_mergeability_change_without_updated_at_is_seen(github):
+    # GitHub reports null while it computes mergeability, and a moving base
+    # branch can make a PR dirty later, neither of which bumps updated_at
+    github.mergeable, github.mergeable_state = None, "unknown"
+    asyncio.run(server.get_pr_content("https://github.com/owner/repo/pull/1"))
+
+    github.mergeable, github.mergeable_state = False, "dirty"
+    server._pr_cache.clear()
+    content = asyncio.run(server.get_pr_content("https://github.com/owner/repo/pull/1"))
+    assert (content["mergeable"], content["mergeable_state"]) == (False, "dirty")